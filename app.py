@@ -5,6 +5,7 @@ import logging
 import mimetypes
 import os
 import secrets
+import sqlite3
 import string
 import threading
 import time
@@ -15,6 +16,7 @@ from ipaddress import ip_address
 from pathlib import Path
 
 import cv2
+import msgspec
 import numpy as np
 import requests
 from PIL import Image
@@ -32,13 +34,23 @@ from flask import (
 )
 from flask_session import Session
 from flask_socketio import SocketIO
-from sqlalchemy import func, inspect, text
+from sqlalchemy import case, delete, event, func, insert, inspect, lambda_stmt, select, text
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.exc import OperationalError
-from werkzeug.security import check_password_hash, generate_password_hash
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.orm import contains_eager, joinedload, lazyload, load_only, raiseload, selectinload
 
 from call_sessions import CallSessionManager
 from event_handlers import register_event_handlers
-from helpers import admin_required, login_required, logout_required
+from helpers import (
+    admin_required,
+    banned_country_codes,
+    banned_ip_addresses,
+    get_user_by_username,
+    invalidate_lookup,
+    login_required,
+    logout_required,
+)
 from flask import send_from_directory
 
 from models import (
@@ -63,6 +75,8 @@ from models import (
     MarketplaceListing,
     EscrowTransaction,
     MarketplaceRequest,
+    MAX_PASSWORD_LENGTH,
+    PIN_LENGTH,
 )
 
 from security_utils import (
@@ -95,8 +109,35 @@ app.config["UPLOAD_FOLDER"] = str(uploads_path)
 app.config.setdefault("MAX_UPLOAD_SIZE", 25 * 1024 * 1024)  # 25 MB default
 
 # configure database
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///chatterbox.db"
+app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///chatterbox.db")
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+database_url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+if database_url.get_backend_name() == "postgresql":
+    engine_options = {"pool_size": 20, "pool_pre_ping": True}
+    if database_url.get_driver_name() == "psycopg2":
+        # pack ORM flushes and bulk inserts into multi-row statements per round trip
+        engine_options.update(
+            executemany_mode="values_plus_batch",
+            insertmanyvalues_page_size=1000,
+            executemany_batch_page_size=500,
+        )
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options
+
+
+@event.listens_for(Engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Let SQLite readers and writers run concurrently and cut per-write syncs."""
+
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+
 db.init_app(app)
 
 # configure session
@@ -104,8 +145,30 @@ app.config["SESSION_PERMANENT"] = False
 app.config["SESSION_TYPE"] = "filesystem"
 Session(app)
 
-# initialize SocketIO
-socketio = SocketIO(app)
+
+class SocketIOJSON:
+    """JSON codec for Socket.IO packets backed by msgspec's native encoder."""
+
+    @staticmethod
+    def dumps(obj, *args, **kwargs) -> str:
+        return msgspec.json.encode(obj).decode("utf-8")
+
+    @staticmethod
+    def loads(data, *args, **kwargs):
+        return msgspec.json.decode(data)
+
+
+# initialize SocketIO; a shared message queue (e.g. redis://) lets several
+# workers behind a sticky load balancer fan out room emits to each other
+app.config.setdefault("SOCKETIO_MESSAGE_QUEUE", os.environ.get("SOCKETIO_MESSAGE_QUEUE"))
+app.config.setdefault("SOCKETIO_CHANNEL", os.environ.get("SOCKETIO_CHANNEL", "chatterbox"))
+
+socketio = SocketIO(
+    app,
+    message_queue=app.config["SOCKETIO_MESSAGE_QUEUE"],
+    channel=app.config["SOCKETIO_CHANNEL"],
+    json=SocketIOJSON,
+)
 call_manager = CallSessionManager()
 register_event_handlers(socketio, app, call_manager)
 
@@ -132,6 +195,37 @@ def purge_expired_groups() -> None:
     db.session.commit()
 
 
+# Tokens live for an hour, so sweeping them every few minutes is plenty
+UPLOAD_PURGE_INTERVAL_SECONDS = 300
+_next_upload_purge = 0.0
+
+
+def purge_expired_uploads() -> None:
+    """Remove expired upload tokens and the files that were never attached.
+
+    Runs at most once per ``UPLOAD_PURGE_INTERVAL_SECONDS`` per process, so
+    the upload path only pays for the sweep occasionally.
+    """
+    global _next_upload_purge
+    now = time.monotonic()
+    if now < _next_upload_purge:
+        return
+    _next_upload_purge = now + UPLOAD_PURGE_INTERVAL_SECONDS
+
+    expired = MediaUploadToken.expires_at < datetime.now(timezone.utc)
+    orphaned_files = db.session.scalars(
+        select(MediaUploadToken.storage_path).where(expired, MediaUploadToken.consumed_at.is_(None))
+    ).all()
+    result = db.session.execute(
+        delete(MediaUploadToken).where(expired).execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        return
+    db.session.commit()
+    for filename in orphaned_files:
+        (Path(app.config["UPLOAD_FOLDER"]) / filename).unlink(missing_ok=True)
+
+
 def get_membership(user_id: int, group_id: int):
     """Return membership for a user in a group."""
     return GroupMembership.query.filter_by(
@@ -139,6 +233,23 @@ def get_membership(user_id: int, group_id: int):
     ).first()
 
 
+def find_ip_ban(ip_address: str) -> BannedIP | None:
+    """Return the ban entry for an IP address, matched case-insensitively."""
+    normalized = ip_address.lower()
+    stmt = lambda_stmt(
+        lambda: select(BannedIP).where(func.lower(BannedIP.ip_address) == normalized)
+    )
+    return db.session.scalars(stmt).first()
+
+
+def find_country_ban(country_code: str) -> BannedCountry | None:
+    """Return the ban entry for an upper-case country code."""
+    stmt = lambda_stmt(
+        lambda: select(BannedCountry).where(func.upper(BannedCountry.country_code) == country_code)
+    )
+    return db.session.scalars(stmt).first()
+
+
 def get_client_ip() -> str:
     """Return the originating IP for the current request."""
 
@@ -240,34 +351,25 @@ def refresh_police_watchlist(force: bool = False) -> None:
             _police_watchlist_last_sync = now
             return
 
-        new_entries = 0
-        for ip_value in watch_ips:
-            try:
-                exists = (
-                    BannedIP.query.filter(
-                        func.lower(BannedIP.ip_address) == ip_value.lower()
-                    ).first()
-                )
-            except OperationalError:
-                db.create_all()
-                exists = (
-                    BannedIP.query.filter(
-                        func.lower(BannedIP.ip_address) == ip_value.lower()
-                    ).first()
-                )
-            if exists:
-                continue
-            db.session.add(
-                BannedIP(
-                    ip_address=ip_value,
-                    reason="Law-enforcement watchlist auto-ban",
-                )
-            )
-            new_entries += 1
+        banned_query = db.session.query(func.lower(BannedIP.ip_address))
+        try:
+            banned = {value for (value,) in banned_query}
+        except OperationalError:
+            db.create_all()
+            banned = {value for (value,) in banned_query}
+
+        new_rows = [
+            {"ip_address": ip_value, "reason": "Law-enforcement watchlist auto-ban"}
+            for ip_value in watch_ips
+            if ip_value.lower() not in banned
+        ]
+        new_entries = len(new_rows)
 
         if new_entries:
             try:
+                db.session.execute(insert(BannedIP), new_rows)
                 db.session.commit()
+                invalidate_lookup("banned_ips")
             except Exception as exc:  # pragma: no cover - database error
                 db.session.rollback()
                 logger.exception("Failed to persist police watchlist bans: %s", exc)
@@ -310,6 +412,8 @@ def create_upload():
     if not user:
         return jsonify({"error": "User not found."}), 404
 
+    purge_expired_uploads()
+
     privilege_code = (request.form.get("privilege_code") or "").strip() or None
     if media_category == "file" and not has_file_privilege(user, privilege_code):
         return (
@@ -367,7 +471,7 @@ def create_upload():
     )
     db.session.add(upload_token)
     db.session.flush()
-    token_value = upload_token.token
+    token_value = upload_token.token.hex
     db.session.commit()
 
     return (
@@ -402,14 +506,6 @@ def ensure_schema() -> None:
             alter_statements.append(
                 "ALTER TABLE user ADD COLUMN xp INTEGER NOT NULL DEFAULT 0"
             )
-        if "level" not in user_columns:
-            alter_statements.append(
-                "ALTER TABLE user ADD COLUMN level INTEGER NOT NULL DEFAULT 1"
-            )
-        if "badge" not in user_columns:
-            alter_statements.append(
-                "ALTER TABLE user ADD COLUMN badge VARCHAR(50) NOT NULL DEFAULT 'Newcomer'"
-            )
         if "last_arrival_at" not in user_columns:
             alter_statements.append(
                 "ALTER TABLE user ADD COLUMN last_arrival_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP"
@@ -454,6 +550,23 @@ def ensure_schema() -> None:
             alter_statements.append(
                 "ALTER TABLE user ADD COLUMN warning_count INTEGER NOT NULL DEFAULT 0"
             )
+        # level and badge are derived from XP now; the old NOT NULL columns
+        # have no database default and would reject every new user
+        for derived_column in ("level", "badge"):
+            if derived_column in user_columns:
+                alter_statements.append(f"ALTER TABLE user DROP COLUMN {derived_column}")
+
+        if "media_upload_token" in existing_tables:
+            upload_token_columns = {
+                column["name"] for column in inspector.get_columns("media_upload_token")
+            }
+            if "expires_at" not in upload_token_columns:
+                alter_statements.append(
+                    "ALTER TABLE media_upload_token ADD COLUMN expires_at DATETIME"
+                )
+                alter_statements.append(
+                    "UPDATE media_upload_token SET expires_at = datetime(created_at, '+1 hour')"
+                )
 
         for statement in alter_statements:
             db.session.execute(text(statement))
@@ -476,6 +589,14 @@ def ensure_schema() -> None:
         # Ensure any newly introduced tables are created.
         db.create_all()
 
+        # Ensure indexes introduced on existing tables are created. SQLite
+        # does not reflect expression indexes, so checkfirst cannot see them;
+        # let the database skip existing indexes instead.
+        with db.engine.begin() as connection:
+            for table in db.metadata.sorted_tables:
+                for index in table.indexes:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+
 
 ensure_schema()
 
@@ -538,6 +659,18 @@ FILE_PRIVILEGE_CODES = {
 MAX_IMAGE_DIMENSION = 1280
 ELEVATED_LEVEL_THRESHOLD = 3
 
+# Columns needed wherever a user is only shown by name
+USER_NAME_COLUMNS = (User.id, User.username)
+
+# Call lists render the participants' usernames; the users' own eager
+# relationships are not needed there, and anything else must be loaded explicitly.
+CALL_SESSION_LIST_OPTIONS = (
+    joinedload(CallSession.caller).load_only(*USER_NAME_COLUMNS).lazyload("*"),
+    joinedload(CallSession.callee).load_only(*USER_NAME_COLUMNS).lazyload("*"),
+    joinedload(CallSession.ended_by).load_only(*USER_NAME_COLUMNS).lazyload("*"),
+    raiseload("*"),
+)
+
 FACE_CASCADE = cv2.CascadeClassifier(
     str(Path(cv2.data.haarcascades) / "haarcascade_frontalface_default.xml")
 )
@@ -656,36 +789,12 @@ def enforce_bans():
     country_code = get_client_country()
 
     try:
-        ip_ban = (
-            BannedIP.query.filter(
-                func.lower(BannedIP.ip_address) == ip_address.lower()
-            ).first()
-            if ip_address
-            else None
-        )
-        country_ban = (
-            BannedCountry.query.filter(
-                func.upper(BannedCountry.country_code) == country_code
-            ).first()
-            if country_code
-            else None
-        )
+        ip_ban = bool(ip_address) and ip_address.lower() in banned_ip_addresses()
+        country_ban = bool(country_code) and country_code in banned_country_codes()
     except OperationalError:
         db.create_all()
-        ip_ban = (
-            BannedIP.query.filter(
-                func.lower(BannedIP.ip_address) == ip_address.lower()
-            ).first()
-            if ip_address
-            else None
-        )
-        country_ban = (
-            BannedCountry.query.filter(
-                func.upper(BannedCountry.country_code) == country_code
-            ).first()
-            if country_code
-            else None
-        )
+        ip_ban = bool(ip_address) and ip_address.lower() in banned_ip_addresses()
+        country_ban = bool(country_code) and country_code in banned_country_codes()
 
     if ip_ban:
         session.clear()
@@ -780,8 +889,8 @@ def login():
             flash("Username and password are required!")
             return redirect(url_for("login"))
 
-        user = User.query.filter_by(username=username).first()
-        if not user or not check_password_hash(user.password, password):
+        user = get_user_by_username(username, with_password=True)
+        if not user or not user.verify_password(password):
             flash("Invalid username or password!")
             return redirect(url_for("login"))
 
@@ -791,14 +900,10 @@ def login():
 
         ip_address = get_client_ip()
         country_code = get_client_country()
-        if ip_address and BannedIP.query.filter(
-            func.lower(BannedIP.ip_address) == ip_address.lower()
-        ).first():
+        if ip_address and ip_address.lower() in banned_ip_addresses():
             flash("This IP address is banned. Contact support if you believe this is an error.")
             return redirect(url_for("login"))
-        if country_code and BannedCountry.query.filter(
-            func.upper(BannedCountry.country_code) == country_code
-        ).first():
+        if country_code and country_code in banned_country_codes():
             flash("Connections from your region are currently blocked.")
             return redirect(url_for("login"))
 
@@ -832,7 +937,7 @@ def update_pin():
     current_pin = (request.form.get("current-pin") or "").strip()
     user = User.query.get(session["user_id"])
 
-    if not new_pin.isdigit() or len(new_pin) != 4:
+    if not new_pin.isdigit() or len(new_pin) != PIN_LENGTH:
         flash("PIN must be a 4-digit number.")
         return redirect(request.referrer or url_for("chat"))
 
@@ -844,11 +949,11 @@ def update_pin():
         if not current_pin:
             flash("Enter your current PIN before updating it.")
             return redirect(request.referrer or url_for("chat"))
-        if not check_password_hash(user.pin_hash, current_pin):
+        if not user.verify_pin(current_pin):
             flash("Current PIN is incorrect.")
             return redirect(request.referrer or url_for("chat"))
 
-    user.pin_hash = generate_password_hash(new_pin)
+    user.set_pin(new_pin)
     db.session.commit()
     flash("Security PIN updated successfully.")
     return redirect(request.referrer or url_for("chat"))
@@ -868,8 +973,10 @@ def verify_pin():
         return jsonify({"success": True, "message": "No PIN configured."})
     if not pin:
         return jsonify({"success": False, "message": "PIN is required."}), 400
-    if not check_password_hash(user.pin_hash, pin):
+    if not user.verify_pin(pin):
         return jsonify({"success": False, "message": "Incorrect PIN."}), 403
+    if db.session.is_modified(user):
+        db.session.commit()
     return jsonify({"success": True})
 
 
@@ -979,7 +1086,6 @@ def update_profile_details():
     profile.favorite_languages = favorite_languages or None
     profile.social_links = social_links or None
     profile.theme_color = theme_color or None
-    profile.updated_at = datetime.now(timezone.utc)
 
     db.session.commit()
 
@@ -1009,7 +1115,7 @@ def register():
 
         if (
             len(password) < 8
-            or len(password) > 200
+            or len(password) > MAX_PASSWORD_LENGTH
             or not any(char.isupper() for char in password)
             or not any(char.islower() for char in password)
             or not any(char.isdigit() for char in password)
@@ -1027,12 +1133,12 @@ def register():
             flash("You must agree to the license agreement!")
             return redirect(url_for("register"))
 
-        if User.query.filter_by(username=username).first():
+        if get_user_by_username(username):
             flash("Username already exists!")
             return redirect(url_for("register"))
 
-        hashed_password = generate_password_hash(password, method="pbkdf2:sha256")
-        new_user = User(username=username, password=hashed_password)
+        new_user = User(username=username)
+        new_user.set_password(password)
         db.session.add(new_user)
         db.session.commit()
 
@@ -1076,11 +1182,13 @@ def chat():
             flash("Recipient not found!")
             return redirect(url_for("chat"))
         messages = (
-            Message.query.filter(
-                ((Message.user_id == session["user_id"]) & (Message.recipient_id == recipient_id))
-                | ((Message.user_id == recipient_id) & (Message.recipient_id == session["user_id"]))
-            )
+            Message.query.filter(Message.between(session["user_id"], recipient_id))
             .order_by(Message.timestamp.asc())
+            .options(
+                joinedload(Message.sender).load_only(*USER_NAME_COLUMNS).lazyload("*"),
+                selectinload(Message.attachments),
+                raiseload("*"),
+            )
             .all()
         )
         participants = sorted([session["user_id"], recipient_id])
@@ -1089,6 +1197,7 @@ def chat():
         translated_captions = (
             TranslatedTranscript.query.filter_by(call_id=call_identifier)
             .order_by(TranslatedTranscript.created_at.asc())
+            .options(raiseload("*"))
             .limit(200)
             .all()
         )
@@ -1110,6 +1219,11 @@ def chat():
         group_messages = (
             GroupMessage.query.filter_by(group_id=group_id)
             .order_by(GroupMessage.timestamp.asc())
+            .options(
+                joinedload(GroupMessage.membership),
+                selectinload(GroupMessage.attachments),
+                raiseload("*"),
+            )
             .all()
         )
         call_identifier = f"group-{group_id}"
@@ -1117,6 +1231,7 @@ def chat():
         translated_captions = (
             TranslatedTranscript.query.filter_by(call_id=call_identifier)
             .order_by(TranslatedTranscript.created_at.asc())
+            .options(raiseload("*"))
             .limit(200)
             .all()
         )
@@ -1143,6 +1258,7 @@ def chat():
             (MarketplaceListing.expires_at.is_(None)) | (MarketplaceListing.expires_at >= now),
         )
         .order_by(MarketplaceListing.expires_at.asc().nullslast(), MarketplaceListing.view_count.desc())
+        .options(raiseload("*"))
         .limit(12)
         .all()
     )
@@ -1151,6 +1267,7 @@ def chat():
             (MarketplaceRequest.expires_at.is_(None)) | (MarketplaceRequest.expires_at >= now)
         )
         .order_by(MarketplaceRequest.created_at.desc())
+        .options(raiseload("*"))
         .limit(20)
         .all()
     )
@@ -1210,7 +1327,7 @@ def chat_start():
         flash(message)
         return redirect(url_for("chat"))
 
-    recipient = User.query.filter_by(username=username).first()
+    recipient = get_user_by_username(username)
     if not recipient:
         message = "User not found!"
         if payload is not None:
@@ -1373,13 +1490,22 @@ def start_escrow(listing_id: int):
 def user_list():
     """Return the list of users the current user chatted with."""
 
+    user_id = session["user_id"]
+    # aggregate per conversation partner in a subquery, so the user query
+    # itself has no GROUP BY that its eager-loaded columns would break
+    partner_id = case((Message.user_id == user_id, Message.recipient_id), else_=Message.user_id)
+    last_messages = (
+        select(partner_id.label("partner_id"), func.max(Message.timestamp).label("last_message_time"))
+        .where((Message.user_id == user_id) | (Message.recipient_id == user_id))
+        .group_by(partner_id)
+        .subquery()
+    )
     recent_users = (
-        db.session.query(User, func.max(Message.timestamp).label("last_message_time"))
-        .join(Message, (Message.user_id == User.id) | (Message.recipient_id == User.id))
-        .filter((Message.user_id == session["user_id"]) | (Message.recipient_id == session["user_id"]))
-        .filter(User.id != session["user_id"])
-        .group_by(User.id)
-        .order_by(func.max(Message.timestamp).desc())
+        db.session.query(User)
+        .join(last_messages, last_messages.c.partner_id == User.id)
+        .filter(User.id != user_id)
+        .order_by(last_messages.c.last_message_time.desc())
+        .options(load_only(*USER_NAME_COLUMNS, User.is_admin), lazyload(User.profile))
         .all()
     )
 
@@ -1390,7 +1516,7 @@ def user_list():
             "is_admin": bool(user.is_admin),
             "is_moderator": bool(user.is_moderator),
         }
-        for user, _ in recent_users
+        for user in recent_users
     ]
     return jsonify({"users": users})
 
@@ -1540,6 +1666,7 @@ def group_list():
     memberships = (
         GroupMembership.query.filter_by(user_id=session["user_id"])
         .join(Group, GroupMembership.group_id == Group.id)
+        .options(contains_eager(GroupMembership.group))
         .order_by(Group.created_at.desc())
         .all()
     )
@@ -1580,9 +1707,7 @@ def admin_dashboard():
                 ip_address = (request.form.get("ip-address") or "").strip()
                 reason = (request.form.get("ip-reason") or "").strip() or None
                 if ip_address:
-                    exists = BannedIP.query.filter(
-                        func.lower(BannedIP.ip_address) == ip_address.lower()
-                    ).first()
+                    exists = find_ip_ban(ip_address)
                     if exists:
                         flash("That IP address is already banned.")
                     else:
@@ -1602,9 +1727,7 @@ def admin_dashboard():
                 country_code = (request.form.get("country-code") or "").strip().upper()
                 reason = (request.form.get("country-reason") or "").strip() or None
                 if country_code:
-                    exists = BannedCountry.query.filter(
-                        func.upper(BannedCountry.country_code) == country_code
-                    ).first()
+                    exists = find_country_ban(country_code)
                     if exists:
                         flash("That country is already blocked.")
                     else:
@@ -1718,19 +1841,34 @@ def admin_dashboard():
 
         return redirect(url_for("admin_dashboard"))
 
-    users = User.query.order_by(User.username.asc()).all()
+    users = (
+        User.query.order_by(User.username.asc())
+        .options(load_only(*USER_NAME_COLUMNS, User.is_blocked), lazyload("*"))
+        .all()
+    )
     banned_ips = BannedIP.query.order_by(BannedIP.created_at.desc()).all()
     banned_countries = BannedCountry.query.order_by(BannedCountry.created_at.desc()).all()
     blocked_words = BlockedWord.query.order_by(BlockedWord.created_at.desc()).all()
     hubs = CommunicationHub.query.order_by(CommunicationHub.created_at.desc()).all()
-    moderators = ModeratorAssignment.query.order_by(ModeratorAssignment.assigned_at.desc()).all()
+    moderators = (
+        ModeratorAssignment.query.order_by(ModeratorAssignment.assigned_at.desc())
+        .options(
+            joinedload(ModeratorAssignment.user).load_only(*USER_NAME_COLUMNS).lazyload("*"),
+            raiseload("*"),
+        )
+        .all()
+    )
     live_calls = (
         call_manager.get_active_sessions()
         .order_by(CallSession.started_at.desc())
+        .options(*CALL_SESSION_LIST_OPTIONS)
         .all()
     )
     call_history = (
-        CallSession.query.order_by(CallSession.started_at.desc()).limit(20).all()
+        CallSession.query.order_by(CallSession.started_at.desc())
+        .options(*CALL_SESSION_LIST_OPTIONS)
+        .limit(20)
+        .all()
     )
 
     return render_template(
@@ -1782,7 +1920,10 @@ def api_call_history():
 
     limit = request.args.get("limit", default=50, type=int)
     entries = (
-        CallSession.query.order_by(CallSession.started_at.desc()).limit(limit).all()
+        CallSession.query.order_by(CallSession.started_at.desc())
+        .options(*CALL_SESSION_LIST_OPTIONS)
+        .limit(limit)
+        .all()
     )
     return jsonify({"calls": [serialize_call_session(entry) for entry in entries]})
 
@@ -1795,6 +1936,7 @@ def api_live_calls():
     entries = (
         call_manager.get_active_sessions()
         .order_by(CallSession.started_at.desc())
+        .options(*CALL_SESSION_LIST_OPTIONS)
         .all()
     )
     return jsonify({"calls": [serialize_call_session(entry) for entry in entries]})
@@ -1878,8 +2020,7 @@ def conversation_messages(partner_id):
     partner = User.query.get_or_404(partner_id)
 
     messages = Message.query.filter(
-        ((Message.user_id == current_user_id) & (Message.recipient_id == partner_id)) |
-        ((Message.user_id == partner_id) & (Message.recipient_id == current_user_id))
+        Message.between(current_user_id, partner_id)
     ).order_by(Message.timestamp.asc()).all()
 
     serialized = []
@@ -4,19 +4,35 @@ from __future__ import annotations
 
 import secrets
 import string
+import time
+from collections import OrderedDict
 from datetime import datetime, timezone
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, NamedTuple, Optional, Tuple
 
 from flask import current_app
 
 from models import CallSession, User, db
 
 
+_PARTICIPANT_CACHE_TTL_SECONDS = 30
+_PARTICIPANT_CACHE_MAX_ENTRIES = 1024
+
+
+class CallParticipants(NamedTuple):
+    """Immutable routing details of a call session."""
+
+    session_id: int
+    caller_id: Optional[int]
+    callee_id: Optional[int]
+    room_id: str
+
+
 class CallSessionManager:
     """Manage lifecycle of voice/video call sessions."""
 
     def __init__(self) -> None:
         self._active_by_room: Dict[str, int] = {}
+        self._participants: "OrderedDict[int, Tuple[float, CallParticipants]]" = OrderedDict()
 
     # ------------------------------------------------------------------
     # helpers
@@ -30,21 +46,48 @@ class CallSessionManager:
 
     def _clear_active(self, session: CallSession) -> None:
         self._active_by_room.pop(session.room_id, None)
+        self._participants.pop(session.id, None)
 
     # ------------------------------------------------------------------
     # lookups
     # ------------------------------------------------------------------
     def get_session(self, session_id: int) -> Optional[CallSession]:
-        return CallSession.query.get(session_id)
+        return db.session.get(CallSession, session_id)
+
+    def get_participants(self, session_id) -> Optional[CallParticipants]:
+        """Return cached routing details for a session, loading them on a miss."""
+
+        try:
+            key = int(session_id)
+        except (TypeError, ValueError):
+            return None
+
+        now = time.monotonic()
+        cached = self._participants.get(key)
+        if cached and cached[0] > now:
+            self._participants.move_to_end(key)
+            return cached[1]
+
+        session = self.get_session(key)
+        if not session:
+            self._participants.pop(key, None)
+            return None
+
+        participants = CallParticipants(session.id, session.caller_id, session.callee_id, session.room_id)
+        self._participants[key] = (now + _PARTICIPANT_CACHE_TTL_SECONDS, participants)
+        self._participants.move_to_end(key)
+        while len(self._participants) > _PARTICIPANT_CACHE_MAX_ENTRIES:
+            self._participants.popitem(last=False)
+        return participants
 
     def get_session_by_room(self, room_id: str) -> Optional[CallSession]:
         session_id = self._active_by_room.get(room_id)
         if session_id:
-            return CallSession.query.get(session_id)
-        return CallSession.query.filter_by(room_id=room_id).first()
+            return db.session.get(CallSession, session_id)
+        return db.session.query(CallSession).filter_by(room_id=room_id).first()
 
     def get_active_sessions(self):
-        return CallSession.query.filter(CallSession.status.in_(["ringing", "active"]))
+        return db.session.query(CallSession).filter(CallSession.status.in_(["ringing", "active"]))
 
     # ------------------------------------------------------------------
     # permissions
@@ -55,7 +98,7 @@ class CallSessionManager:
 
     def _is_user_busy(self, user_id: int) -> bool:
         return (
-            CallSession.query.filter(
+            db.session.query(CallSession).filter(
                 CallSession.status.in_(["ringing", "active"]),
                 (CallSession.caller_id == user_id) | (CallSession.callee_id == user_id),
             ).first()
@@ -130,6 +173,40 @@ class CallSessionManager:
         db.session.commit()
         self._clear_active(session)
 
+    def end_calls_for_user(self, user_id: int) -> List[Tuple[int, str, Optional[str]]]:
+        """End every live call the user takes part in.
+
+        Returns ``(session_id, room_id, username)`` rows, where ``username`` is
+        the name of the user ending the calls, fetched in the same query.
+        """
+
+        rows = (
+            self.get_active_sessions()
+            .filter((CallSession.caller_id == user_id) | (CallSession.callee_id == user_id))
+            .outerjoin(User, User.id == user_id)
+            .with_entities(CallSession.id, CallSession.room_id, User.username)
+            .all()
+        )
+        if not rows:
+            return []
+
+        db.session.query(CallSession).filter(
+            CallSession.id.in_([session_id for session_id, _, _ in rows])
+        ).update(
+            {
+                CallSession.status: "ended",
+                CallSession.ended_at: datetime.now(timezone.utc),
+                CallSession.ended_by_id: user_id if rows[0][2] is not None else None,
+                CallSession.terminated_by_moderator: False,
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+        for session_id, room_id, _ in rows:
+            self._active_by_room.pop(room_id, None)
+            self._participants.pop(session_id, None)
+        return rows
+
     def mark_notes(self, session: CallSession, notes: Optional[str]) -> None:
         session.notes = notes
         db.session.commit()
@@ -139,5 +216,5 @@ class CallSessionManager:
         db.session.commit()
 
     def is_user_blocked(self, user_id: int) -> bool:
-        user = User.query.get(user_id)
+        user = db.session.get(User, user_id)
         return bool(user and user.is_blocked)
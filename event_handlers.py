@@ -4,17 +4,20 @@
 # import
 import base64
 import logging
+import threading
 import time
+import uuid
 from collections import defaultdict, deque
 from datetime import datetime, timezone
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
-from flask import session, url_for
+from flask import request, session, url_for
 from flask_socketio import emit, join_room, leave_room
+from sqlalchemy import insert, lambda_stmt, select
 
 from achievements import apply_progress
+from helpers import blocked_words, get_user_cached, get_user_id_by_username
 from models import (
-    BlockedWord,
     GroupMembership,
     GroupMessage,
     GroupMessageAttachment,
@@ -52,16 +55,26 @@ _rate_limiter: Dict[int, deque] = defaultdict(deque)
 _PREFERENCE_TTL_SECONDS = 60 * 60  # 1 hour cache
 _RATE_LIMIT_WINDOW_SECONDS = 5
 _RATE_LIMIT_MAX_EVENTS = 20
+_SOCKET_USER_KEY = "chatterbox.user_id"
+_ICE_BATCH_WINDOW_SECONDS = 0.02
+_ice_batches: Dict[Tuple[int, str], List[object]] = {}
+_ice_batches_lock = threading.Lock()
+
+
+def _socket_user_id() -> Optional[int]:
+    """Return the user id resolved once when the socket connected."""
+
+    environ = request.environ
+    if _SOCKET_USER_KEY in environ:
+        return environ[_SOCKET_USER_KEY]
+    return session.get("user_id")
 
 
 def _contains_blocked_language(text: str) -> bool:
     if not text:
         return False
     lowered = text.lower()
-    for entry in BlockedWord.query.all():
-        if entry.word and entry.word.lower() in lowered:
-            return True
-    return False
+    return any(word in lowered for word in blocked_words())
 
 
 def _get_speech_client() -> Optional["speech.SpeechClient"]:
@@ -186,7 +199,8 @@ def register_event_handlers(socketio, app, call_manager):
     def handle_send_message(data):
         """Handle direct message sending."""
 
-        if "user_id" not in session:
+        user_id = _socket_user_id()
+        if not user_id:
             emit("error", {"error": "You must be logged in to send messages!"})
             return
 
@@ -210,12 +224,13 @@ def register_event_handlers(socketio, app, call_manager):
             emit("error", {"error": "Recipient is required!"})
             return
 
-        recipient_db = User.query.filter_by(username=recipient).first()
-        if not recipient_db:
+        # only the id is needed, so skip loading the recipient row
+        recipient_id = get_user_id_by_username(recipient)
+        if recipient_id is None:
             emit("error", {"error": "Recipient not found!"})
             return
 
-        sender = User.query.get(session["user_id"])
+        sender = db.session.get(User, user_id)
         now = datetime.now(timezone.utc)
         if sender and sender.muted_until:
             if sender.muted_until > now:
@@ -228,55 +243,61 @@ def register_event_handlers(socketio, app, call_manager):
             emit("error", {"error": "Your message contains blocked language."})
             return
 
-        conversation_id = conversation_identifier_for_direct(session["user_id"], recipient_db.id)
+        conversation_id = conversation_identifier_for_direct(user_id, recipient_id)
         nonce, ciphertext = encrypt_conversation_message(conversation_id, message)
 
-        new_message = Message(
-            user_id=session["user_id"],
-            recipient_id=recipient_db.id,
-            text="" if ciphertext else message,
-            ciphertext=ciphertext,
-            nonce=nonce,
-            is_encrypted=bool(ciphertext),
-            timestamp=datetime.now(timezone.utc),
-        )
-        db.session.add(new_message)
+        # a plain INSERT ... RETURNING skips the unit of work for the message
+        # and the reload of its expired attributes after the commit
+        timestamp = datetime.now(timezone.utc)
+        message_id = db.session.execute(
+            insert(Message)
+            .values(
+                user_id=user_id,
+                recipient_id=recipient_id,
+                text="" if ciphertext else message,
+                ciphertext=ciphertext,
+                nonce=nonce,
+                is_encrypted=bool(ciphertext),
+                timestamp=timestamp,
+            )
+            .returning(Message.id)
+        ).scalar_one()
+        progress = None
         if sender:
-            apply_progress(sender, 5)
+            level, badge = apply_progress(sender, 5)
+            progress = {"xp": sender.xp, "level": level, "badge": badge}
         db.session.commit()
 
         payload = {
-            "message_id": new_message.id,
+            "message_id": message_id,
             "username": username,
-            "sender_id": session["user_id"],
-            "recipient": recipient_db.username,
-            "recipient_id": recipient_db.id,
+            "sender_id": user_id,
+            "recipient": recipient,
+            "recipient_id": recipient_id,
             "message": None if ciphertext else message,
             "ciphertext": ciphertext,
             "nonce": nonce,
             "is_encrypted": bool(ciphertext),
             "conversation": conversation_id,
-            "timestamp": new_message.timestamp.isoformat() if new_message.timestamp else None,
+            # match the naive UTC format stored rows are serialized with
+            "timestamp": timestamp.replace(tzinfo=None).isoformat(),
             "attachments": [],
         }
-        recipient_room = f"user_{recipient_db.id}"
-        sender_room = f"user_{session['user_id']}"
+        recipient_room = f"user_{recipient_id}"
+        sender_room = f"user_{user_id}"
 
-        emit("receive_message", payload, room=recipient_room)
-        emit("receive_message", payload, room=sender_room)
+        # one emit encodes the packet once and reaches each connection once
+        emit("receive_message", payload, to=[recipient_room, sender_room])
 
-        if sender:
-            socketio.emit(
-                "progress_update",
-                {"xp": sender.xp, "level": sender.level, "badge": sender.badge},
-                room=f"user_{sender.id}",
-            )
+        if progress:
+            socketio.emit("progress_update", progress, room=sender_room)
 
     @socketio.on("send_group_message")
     def handle_send_group_message(data):
         """Handle sending messages in hidden group chats."""
 
-        if "user_id" not in session:
+        user_id = _socket_user_id()
+        if not user_id:
             emit("error", {"error": "You must be logged in to send messages!"})
             return
 
@@ -294,7 +315,7 @@ def register_event_handlers(socketio, app, call_manager):
             emit("error", {"error": "Message must be at most 500 characters long!"})
             return
 
-        sender = User.query.get(session["user_id"])
+        sender = db.session.get(User, user_id)
         now = datetime.now(timezone.utc)
         if sender and sender.muted_until:
             if sender.muted_until > now:
@@ -307,8 +328,8 @@ def register_event_handlers(socketio, app, call_manager):
             emit("error", {"error": "Your message contains blocked language."})
             return
 
-        membership = GroupMembership.query.filter_by(
-            group_id=group_id, user_id=session["user_id"]
+        membership = db.session.query(GroupMembership).filter_by(
+            group_id=group_id, user_id=user_id
         ).first()
         if not membership:
             emit("error", {"error": "You are not a member of this hidden group."})
@@ -360,14 +381,15 @@ def register_event_handlers(socketio, app, call_manager):
             socketio.emit(
                 "progress_update",
                 {"xp": sender.xp, "level": sender.level, "badge": sender.badge},
-                room=f"user_{sender.id}",
+                room=sender.room,
             )
 
     @socketio.on("send_media_message")
     def handle_send_media_message(data):
         """Handle sending messages with media attachments."""
 
-        if "user_id" not in session:
+        user_id = _socket_user_id()
+        if not user_id:
             emit("error", {"error": "You must be logged in to send messages!"})
             return
 
@@ -376,8 +398,19 @@ def register_event_handlers(socketio, app, call_manager):
             emit("error", {"error": "Missing media upload token."})
             return
 
-        upload_token = MediaUploadToken.query.filter_by(
-            token=upload_token_value, user_id=session["user_id"]
+        try:
+            upload_token_value = uuid.UUID(upload_token_value)
+        except (TypeError, ValueError):
+            emit("error", {"error": "Media token is invalid or expired."})
+            return
+
+        upload_token = db.session.scalars(
+            lambda_stmt(
+                lambda: select(MediaUploadToken).where(
+                    MediaUploadToken.token == upload_token_value,
+                    MediaUploadToken.user_id == user_id,
+                )
+            )
         ).first()
         if not upload_token or upload_token.is_consumed or upload_token.is_expired:
             emit("error", {"error": "Media token is invalid or expired."})
@@ -395,7 +428,7 @@ def register_event_handlers(socketio, app, call_manager):
             "mime_type": upload_token.mime_type,
         }
 
-        sender = User.query.get(session["user_id"])
+        sender = db.session.get(User, user_id)
         now = datetime.now(timezone.utc)
         if sender and sender.muted_until:
             if sender.muted_until > now:
@@ -413,8 +446,8 @@ def register_event_handlers(socketio, app, call_manager):
                 emit("error", {"error": "Group is required for media message."})
                 return
 
-            membership = GroupMembership.query.filter_by(
-                group_id=group_id, user_id=session["user_id"]
+            membership = db.session.query(GroupMembership).filter_by(
+                group_id=group_id, user_id=user_id
             ).first()
             if not membership:
                 emit("error", {"error": "You are not a member of this hidden group."})
@@ -486,7 +519,7 @@ def register_event_handlers(socketio, app, call_manager):
                 socketio.emit(
                     "progress_update",
                     {"xp": sender.xp, "level": sender.level, "badge": sender.badge},
-                    room=f"user_{sender.id}",
+                    room=sender.room,
                 )
             return
 
@@ -499,17 +532,17 @@ def register_event_handlers(socketio, app, call_manager):
             emit("error", {"error": "Recipient is required."})
             return
 
-        recipient = User.query.filter_by(username=recipient_username).first()
-        if not recipient:
+        recipient_id = get_user_id_by_username(recipient_username)
+        if recipient_id is None:
             emit("error", {"error": "Recipient not found!"})
             return
 
-        conversation_id = conversation_identifier_for_direct(session["user_id"], recipient.id)
+        conversation_id = conversation_identifier_for_direct(user_id, recipient_id)
         nonce, ciphertext = encrypt_conversation_message(conversation_id, caption)
 
         new_message = Message(
-            user_id=session["user_id"],
-            recipient_id=recipient.id,
+            user_id=user_id,
+            recipient_id=recipient_id,
             text="" if ciphertext else caption,
             ciphertext=ciphertext,
             nonce=nonce,
@@ -537,9 +570,9 @@ def register_event_handlers(socketio, app, call_manager):
         payload = {
             "message_id": new_message.id,
             "username": username,
-            "sender_id": session["user_id"],
-            "recipient": recipient.username,
-            "recipient_id": recipient.id,
+            "sender_id": user_id,
+            "recipient": recipient_username,
+            "recipient_id": recipient_id,
             "message": None if ciphertext else caption,
             "ciphertext": ciphertext,
             "nonce": nonce,
@@ -556,23 +589,24 @@ def register_event_handlers(socketio, app, call_manager):
                 }
             ],
         }
-        recipient_room = f"user_{recipient.id}"
-        sender_room = f"user_{session['user_id']}"
-        emit("receive_message", payload, room=recipient_room)
-        emit("receive_message", payload, room=sender_room)
+        recipient_room = f"user_{recipient_id}"
+        sender_room = f"user_{user_id}"
+        # one emit encodes the packet once and reaches each connection once
+        emit("receive_message", payload, to=[recipient_room, sender_room])
 
         if sender:
             socketio.emit(
                 "progress_update",
                 {"xp": sender.xp, "level": sender.level, "badge": sender.badge},
-                room=f"user_{sender.id}",
+                room=sender.room,
             )
 
     @socketio.on("join_call_room")
     def handle_join_call_room_event(data):
         """Allow callers to subscribe to translated caption broadcasts."""
 
-        if "user_id" not in session:
+        user_id = _socket_user_id()
+        if not user_id:
             emit("error", {"error": "You must be logged in to join calls."})
             return
 
@@ -588,7 +622,8 @@ def register_event_handlers(socketio, app, call_manager):
     def handle_set_translation_preferences(data):
         """Persist participant translation preferences during a call."""
 
-        if "user_id" not in session:
+        user_id = _socket_user_id()
+        if not user_id:
             emit("error", {"error": "You must be logged in to configure translation."})
             return
 
@@ -602,7 +637,7 @@ def register_event_handlers(socketio, app, call_manager):
         source_language = (data or {}).get("source_language") or None
 
         preferences = _translation_preferences[call_id]
-        preferences[session["user_id"]] = {
+        preferences[user_id] = {
             "language": target_language,
             "enabled": enabled,
             "source_language": source_language,
@@ -622,11 +657,12 @@ def register_event_handlers(socketio, app, call_manager):
     def handle_call_transcription_chunk(data):
         """Process audio samples, transcribe them, and broadcast translations."""
 
-        if "user_id" not in session:
+        user_id = _socket_user_id()
+        if not user_id:
             emit("error", {"error": "You must be logged in to stream audio."})
             return
 
-        if not _allow_transcription_request(session["user_id"]):
+        if not _allow_transcription_request(user_id):
             emit(
                 "translation_error",
                 {
@@ -659,9 +695,10 @@ def register_event_handlers(socketio, app, call_manager):
 
         preferences = _prune_preferences(call_id)
 
+        transcript_rows = []
         translated_entries = []
         if preferences:
-            for user_id, preference in preferences.items():
+            for participant_id, preference in preferences.items():
                 if not preference.get("enabled"):
                     continue
                 target_language = (preference.get("language") or "en").split("-")[0]
@@ -672,15 +709,16 @@ def register_event_handlers(socketio, app, call_manager):
                 )
                 if translation is None:
                     continue
-                entry = TranslatedTranscript(
-                    call_id=call_id,
-                    speaker_user_id=session.get("user_id"),
-                    original_language=detected_language,
-                    target_language=target_language,
-                    transcript_text=transcript_text,
-                    translated_text=translation,
+                transcript_rows.append(
+                    {
+                        "call_id": call_id,
+                        "speaker_user_id": user_id,
+                        "original_language": detected_language,
+                        "target_language": target_language,
+                        "transcript_text": transcript_text,
+                        "translated_text": translation,
+                    }
                 )
-                db.session.add(entry)
                 translated_entries.append(
                     {
                         "call_id": call_id,
@@ -688,13 +726,14 @@ def register_event_handlers(socketio, app, call_manager):
                         "translation": translation,
                         "transcript": transcript_text,
                         "original_language": detected_language,
-                        "speaker_user_id": session.get("user_id"),
+                        "speaker_user_id": user_id,
                         "timestamp": datetime.now(timezone.utc).isoformat(),
                     }
                 )
 
         if translated_entries:
             try:
+                db.session.execute(insert(TranslatedTranscript), transcript_rows)
                 db.session.commit()
             except Exception as exc:  # pragma: no cover - database error
                 db.session.rollback()
@@ -708,7 +747,7 @@ def register_event_handlers(socketio, app, call_manager):
             try:
                 fallback_entry = TranslatedTranscript(
                     call_id=call_id,
-                    speaker_user_id=session.get("user_id"),
+                    speaker_user_id=user_id,
                     original_language=detected_language,
                     target_language=fallback_language,
                     transcript_text=transcript_text,
@@ -727,7 +766,7 @@ def register_event_handlers(socketio, app, call_manager):
                     "translation": transcript_text,
                     "transcript": transcript_text,
                     "original_language": detected_language,
-                    "speaker_user_id": session.get("user_id"),
+                    "speaker_user_id": user_id,
                     "timestamp": datetime.now(timezone.utc).isoformat(),
                 },
                 room=f"call_{call_id}",
@@ -737,11 +776,11 @@ def register_event_handlers(socketio, app, call_manager):
     def handle_join_group_room(data):
         """Allow clients to join group rooms dynamically."""
 
-        user_id = session.get("user_id")
+        user_id = _socket_user_id()
         group_id = data.get("group_id") if data else None
         if not user_id or not group_id:
             return
-        membership = GroupMembership.query.filter_by(
+        membership = db.session.query(GroupMembership).filter_by(
             group_id=group_id, user_id=user_id
         ).first()
         if membership:
@@ -752,16 +791,19 @@ def register_event_handlers(socketio, app, call_manager):
         """Handle the "connect" event."""
 
         user_id = session.get("user_id")
+        request.environ[_SOCKET_USER_KEY] = user_id
         if user_id:
             join_room(f"user_{user_id}")
-            for membership in GroupMembership.query.filter_by(user_id=user_id).all():
-                join_room(f"group_{membership.group_id}")
+            for (group_id,) in (
+                db.session.query(GroupMembership.group_id).filter_by(user_id=user_id).all()
+            ):
+                join_room(f"group_{group_id}")
 
     @socketio.on("call_request")
     def handle_call_request(data):
         """Initiate a WebRTC call."""
 
-        user_id = session.get("user_id")
+        user_id = _socket_user_id()
         if not user_id:
             emit("call_error", {"error": "Login required."})
             return
@@ -778,8 +820,8 @@ def register_event_handlers(socketio, app, call_manager):
             emit("call_error", {"error": "Missing WebRTC offer."})
             return
 
-        caller = User.query.get(user_id)
-        callee = User.query.filter_by(username=target_username).first()
+        caller = db.session.get(User, user_id)
+        callee = db.session.query(User).filter_by(username=target_username).first()
         if not callee:
             emit("call_error", {"error": "Recipient not found."})
             return
@@ -808,14 +850,14 @@ def register_event_handlers(socketio, app, call_manager):
                 "offer": offer,
                 "mode": mode,
             },
-            room=f"user_{callee.id}",
+            room=callee.room,
         )
 
     @socketio.on("call_answer")
     def handle_call_answer(data):
         """Handle callee response to a call."""
 
-        user_id = session.get("user_id")
+        user_id = _socket_user_id()
         if not user_id:
             emit("call_error", {"error": "Login required."})
             return
@@ -831,7 +873,7 @@ def register_event_handlers(socketio, app, call_manager):
             emit("call_error", {"error": "Call not found."})
             return
 
-        callee = User.query.get(user_id)
+        callee = get_user_cached(user_id)
         if session_obj.callee_id != callee.id:
             emit("call_error", {"error": "You are not part of this call."})
             return
@@ -848,7 +890,7 @@ def register_event_handlers(socketio, app, call_manager):
                         "roomId": session_obj.room_id,
                         "mode": mode,
                     },
-                    room=f"user_{session_obj.caller_id}",
+                    room=session_obj.caller_room,
                 )
             return
 
@@ -870,38 +912,56 @@ def register_event_handlers(socketio, app, call_manager):
                 "answer": answer,
                 "mode": mode,
             },
-            room=session_obj.room_id,
+            room=session_obj.caller_room,
         )
 
     @socketio.on("ice_candidate")
     def handle_ice_candidate(data):
         """Relay ICE candidates between peers."""
 
-        user_id = session.get("user_id")
+        user_id = _socket_user_id()
         if not user_id:
             return
 
         session_id = (data or {}).get("sessionId")
         candidate = (data or {}).get("candidate")
-        session_obj = call_manager.get_session(session_id)
-        if not session_obj or not candidate:
+        participants = call_manager.get_participants(session_id)
+        if not participants or not candidate:
             return
 
-        if user_id not in {session_obj.caller_id, session_obj.callee_id}:
+        if user_id != participants.caller_id and user_id != participants.callee_id:
             return
 
+        # candidates arrive in bursts; collect each sender's burst and relay it
+        # to the peer as a single event once the batch window has passed
+        key = (participants.session_id, request.sid)
+        with _ice_batches_lock:
+            batch = _ice_batches.get(key)
+            if batch is not None:
+                batch.append(candidate)
+                return
+            _ice_batches[key] = [candidate]
+        socketio.start_background_task(_flush_ice_batch, key, participants.room_id)
+
+    def _flush_ice_batch(key, room_id):
+        socketio.sleep(_ICE_BATCH_WINDOW_SECONDS)
+        with _ice_batches_lock:
+            candidates = _ice_batches.pop(key, None)
+        if not candidates:
+            return
+        session_id, sender_sid = key
         socketio.emit(
-            "ice_candidate",
-            {"sessionId": session_obj.id, "candidate": candidate},
-            room=session_obj.room_id,
-            include_self=False,
+            "ice_candidates",
+            {"sessionId": session_id, "candidates": candidates},
+            room=room_id,
+            skip_sid=sender_sid,
         )
 
     @socketio.on("call_hangup")
     def handle_call_hangup(data):
         """Terminate a call initiated by a participant."""
 
-        user_id = session.get("user_id")
+        user_id = _socket_user_id()
         if not user_id:
             return
 
@@ -910,11 +970,12 @@ def register_event_handlers(socketio, app, call_manager):
         if not session_obj:
             return
 
-        if user_id not in {session_obj.caller_id, session_obj.callee_id}:
+        if user_id != session_obj.caller_id and user_id != session_obj.callee_id:
             return
 
-        user = User.query.get(user_id)
+        user = get_user_cached(user_id)
         call_manager.end_call(session_obj, user)
+        peer_room = session_obj.callee_room if user_id == session_obj.caller_id else session_obj.caller_room
         socketio.emit(
             "call_ended",
             {
@@ -922,7 +983,7 @@ def register_event_handlers(socketio, app, call_manager):
                 "roomId": session_obj.room_id,
                 "endedBy": user.username if user else None,
             },
-            room=session_obj.room_id,
+            room=peer_room,
         )
         leave_room(session_obj.room_id)
 
@@ -930,30 +991,26 @@ def register_event_handlers(socketio, app, call_manager):
     def handle_disconnect():
         """Handle the "disconnect" event."""
 
-        user_id = session.get("user_id")
+        user_id = _socket_user_id()
         if user_id:
             leave_room(f"user_{user_id}")
-            for membership in GroupMembership.query.filter_by(user_id=user_id).all():
-                leave_room(f"group_{membership.group_id}")
-
-            active_sessions = (
-                call_manager.get_active_sessions()
-                .filter(
-                    (CallSession.caller_id == user_id)
-                    | (CallSession.callee_id == user_id)
-                )
-                .all()
-            )
-            user = User.query.get(user_id)
-            for session_obj in active_sessions:
-                call_manager.end_call(session_obj, user)
+            for (group_id,) in (
+                db.session.query(GroupMembership.group_id).filter_by(user_id=user_id).all()
+            ):
+                leave_room(f"group_{group_id}")
+
+            ended_calls = call_manager.end_calls_for_user(user_id)
+            for session_id, room_id, ended_by in ended_calls:
                 socketio.emit(
                     "call_ended",
                     {
-                        "sessionId": session_obj.id,
-                        "roomId": session_obj.room_id,
-                        "endedBy": user.username if user else None,
+                        "sessionId": session_id,
+                        "roomId": room_id,
+                        "endedBy": ended_by,
                     },
-                    room=session_obj.room_id,
+                    room=room_id,
                 )
-                leave_room(session_obj.room_id)
+            for _, room_id, _ in ended_calls:
+                leave_room(room_id)
+
+            db.session.close()
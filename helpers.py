@@ -2,46 +2,192 @@
 
 
 # import libraries
-from flask import session, flash, redirect, url_for
+import time
+from flask import abort, g, request, session, flash, redirect, url_for
 from functools import wraps
+from sqlalchemy import event, func, inspect, lambda_stmt, select
+from sqlalchemy.orm import undefer
 
+from models import BannedCountry, BannedIP, BlockedWord, User, db
 
-def login_required(f):
+
+# How long a process may serve a lookup table without re-reading it; local
+# writes invalidate immediately, this bounds staleness across workers.
+_LOOKUP_CACHE_TTL_SECONDS = 60
+_lookup_cache = {}
+
+# Usernames resolved to ids; only hits are kept, so new users are found at once.
+_USER_ID_CACHE_MAX_ENTRIES = 20000
+_user_id_cache = {}
+
+
+def get_user_cached(user_id):
+    """
+    Return the user for the given id, fetching it at most once per context.
+    """
+
+    if user_id is None:
+        return None
+    if "user_cache" not in g:
+        g.user_cache = {}
+    if user_id not in g.user_cache:
+        g.user_cache[user_id] = db.session.get(User, user_id)
+    return g.user_cache[user_id]
+
+
+def get_user_by_username(username, with_password=False):
     """
-    Decorator function to require login.
+    Return the user with the given username, reusing the cached statement.
+
+    Pass ``with_password`` when the (deferred) password hash will be checked,
+    so it is loaded with the row instead of by a second query.
     """
 
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not session.get("user_id"):
-            flash("You must be logged in to access this page.")
-            return redirect(url_for("login"))
-        return f(*args, **kwargs)
-    return decorated_function
+    stmt = lambda_stmt(lambda: select(User).where(User.username == username))
+    if with_password:
+        stmt += lambda s: s.options(undefer(User.password))
+    return db.session.scalars(stmt).first()
 
 
-def logout_required(f):
+def get_user_id_by_username(username):
     """
-    Decorator function to require logOUT.
+    Return the id of the user with the given username, or None.
     """
-    
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if session.get("user_id"):
-            flash("You are already logged in.")
-            return redirect(url_for("chat"))
-        return f(*args, **kwargs)
-    return decorated_function
+
+    user_id = _user_id_cache.get(username)
+    if user_id is not None:
+        return user_id
+    stmt = lambda_stmt(lambda: select(User.id).where(User.username == username))
+    user_id = db.session.scalar(stmt)
+    if user_id is not None:
+        if len(_user_id_cache) >= _USER_ID_CACHE_MAX_ENTRIES:
+            _user_id_cache.pop(next(iter(_user_id_cache)), None)
+        _user_id_cache[username] = user_id
+    return user_id
+
+
+@event.listens_for(User, "after_update")
+def _forget_renamed_username(mapper, connection, target):
+    # the old username is not loaded when an expired user is renamed, so
+    # drop entries by id; renames are rare enough for the scan
+    if inspect(target).attrs.username.history.has_changes():
+        for username in [name for name, user_id in _user_id_cache.items() if user_id == target.id]:
+            _user_id_cache.pop(username, None)
+
+
+@event.listens_for(User, "after_delete")
+def _forget_deleted_username(mapper, connection, target):
+    _user_id_cache.pop(target.username, None)
+
+
+def cached_lookup(name, loader):
+    """
+    Return a process-wide cached lookup table, reloading it when stale.
+    """
+
+    now = time.monotonic()
+    cached = _lookup_cache.get(name)
+    if cached and cached[0] > now:
+        return cached[1]
+    value = loader()
+    _lookup_cache[name] = (now + _LOOKUP_CACHE_TTL_SECONDS, value)
+    return value
+
+
+def invalidate_lookup(name):
+    """
+    Drop a cached lookup table so the next read reloads it.
+    """
+
+    _lookup_cache.pop(name, None)
+
+
+def banned_ip_addresses():
+    """
+    Return the lower-cased set of banned IP addresses.
+    """
+
+    return cached_lookup(
+        "banned_ips",
+        lambda: frozenset(db.session.scalars(select(func.lower(BannedIP.ip_address)))),
+    )
+
+
+def banned_country_codes():
+    """
+    Return the upper-cased set of blocked country codes.
+    """
+
+    return cached_lookup(
+        "banned_countries",
+        lambda: frozenset(db.session.scalars(select(func.upper(BannedCountry.country_code)))),
+    )
+
+
+def blocked_words():
+    """
+    Return the lower-cased blocked words.
+    """
+
+    return cached_lookup(
+        "blocked_words",
+        lambda: tuple(word.lower() for word in db.session.scalars(select(BlockedWord.word)) if word),
+    )
+
+
+for _model, _name in (
+    (BannedIP, "banned_ips"),
+    (BannedCountry, "banned_countries"),
+    (BlockedWord, "blocked_words"),
+):
+    for _identifier in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _identifier, lambda *_, name=_name: invalidate_lookup(name))
+
+
+def _wants_json() -> bool:
+    """
+    Return whether the current request comes from an API or XHR client.
+    """
+
+    return (
+        request.path.startswith("/api/")
+        or request.is_json
+        or request.accept_mimetypes.best == "application/json"
+    )
+
+
+def _require(check, message, endpoint, api_status=None):
+    """
+    Build a decorator that redirects to an endpoint when the check fails.
+
+    When ``api_status`` is given, API clients get that status code instead,
+    skipping the flash message (and the session write it causes).
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if not check():
+                if api_status and _wants_json():
+                    abort(api_status)
+                flash(message)
+                return redirect(url_for(endpoint))
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
 
 
-def admin_required(f):
-    """Decorator function to require admin privileges."""
+# Decorator function to require login.
+login_required = _require(
+    lambda: session.get("user_id"), "You must be logged in to access this page.", "login", 401
+)
 
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        if not session.get("is_admin"):
-            flash("Administrator access required.")
-            return redirect(url_for("chat"))
-        return f(*args, **kwargs)
+# Decorator function to require logOUT.
+logout_required = _require(
+    lambda: not session.get("user_id"), "You are already logged in.", "chat"
+)
 
-    return decorated_function
\ No newline at end of file
+# Decorator function to require admin privileges.
+admin_required = _require(
+    lambda: session.get("is_admin"), "Administrator access required.", "chat", 403
+)
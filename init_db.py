@@ -13,6 +13,7 @@ db_path = os.path.join("instance", "chatterbox.db")
 force = "-f" in sys.argv
 
 # check if the database file exists and remove it
+removed = False
 if os.path.exists(db_path):
     if not force:
         # ask the user for confirmation
@@ -22,11 +23,27 @@ if os.path.exists(db_path):
             print("Operation cancelled")
             exit()
 
-    # remove the database file
+    # remove the database file along with its WAL journal
     os.remove(db_path)
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    removed = True
     print("Database file removed")
 
-# create the database tables
+# create the database tables in a single transaction
 with app.app_context():
-    db.create_all()
+    # drop pooled connections that still point at the removed file
+    db.engine.dispose()
+    # pysqlite does not emit BEGIN before DDL, so hand transaction control
+    # to the database and open the transaction explicitly
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.exec_driver_sql("BEGIN")
+        try:
+            # a freshly removed database has no tables to check for
+            db.metadata.create_all(connection, checkfirst=not removed)
+        except Exception:
+            connection.exec_driver_sql("ROLLBACK")
+            raise
+        connection.exec_driver_sql("COMMIT")
     print("Database tables created")
\ No newline at end of file
@@ -1,9 +1,17 @@
 # Description: This file contains the database models for the application.
 
 # import
+from bisect import bisect_right
 from datetime import datetime, timedelta, timezone
+from functools import cached_property
 import uuid
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import case
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.sql import func
+from werkzeug.security import check_password_hash
 
 
 LEVELS = [
@@ -13,59 +21,211 @@ LEVELS = [
     (4, "Luminary", 300),
     (5, "Oracle", 500),
 ]
+_BADGES_BY_LEVEL = {level: badge for level, badge, _ in LEVELS}
+_LEVEL_THRESHOLDS = [threshold for _, _, threshold in LEVELS]
+
+# Values of the enum-like columns, stored as native enums where the database has them
+CALL_STATUSES = ("initiated", "ringing", "active", "declined", "ended")
+ESCROW_STATUSES = ("held", "released")
+DISCIPLINARY_ACTIONS = ("warn", "mute", "ban")
+MEDIA_TYPES = ("image", "audio", "video", "file")
+
+MAX_PASSWORD_LENGTH = 200
+PIN_LENGTH = 4
 
 # create the database object
 db = SQLAlchemy()
 
+_password_hasher = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=1)
+
+_MEDIA_TYPE = db.Enum(*MEDIA_TYPES, name="media_type")
+# 64-bit keys for the high-volume tables; SQLite keeps INTEGER so the key stays a rowid alias
+_BIG_ID = db.BigInteger().with_variant(db.Integer, "sqlite")
+
+
+def _utcnow() -> datetime:
+    """Return the current UTC time; used as a per-row column default."""
+
+    return datetime.now(timezone.utc)
+
+
+def level_for_xp(xp: int) -> tuple[int, str]:
+    """Return the level and badge reached with the given XP."""
+
+    level, badge, _ = LEVELS[max(bisect_right(_LEVEL_THRESHOLDS, xp) - 1, 0)]
+    return level, badge
+
+
+def _verify_hash(stored: str, candidate: str) -> tuple[bool, bool]:
+    """Return whether the candidate matches and whether the stored hash should be replaced."""
+
+    if not stored.startswith("$argon2"):
+        # werkzeug hashes written before the switch to argon2id
+        return check_password_hash(stored, candidate), True
+    try:
+        _password_hasher.verify(stored, candidate)
+    except (VerificationError, InvalidHashError):
+        return False, False
+    return True, _password_hasher.check_needs_rehash(stored)
+
+
+UPLOAD_TOKEN_TTL = timedelta(hours=1)
+
+
+def _upload_token_expiry() -> datetime:
+    return _utcnow() + UPLOAD_TOKEN_TTL
+
 
 # User database model
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(20), unique=True, nullable=False)
-    password = db.Column(db.String(200), nullable=False)
+    password = db.deferred(db.Column(db.String(128), nullable=False))
     xp = db.Column(db.Integer, nullable=False, default=0)
-    level = db.Column(db.Integer, nullable=False, default=1)
-    badge = db.Column(db.String(50), nullable=False, default="Newcomer")
-    last_arrival_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    last_arrival_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
     pin_hash = db.Column(db.String(200), nullable=True)
     is_admin = db.Column(db.Boolean, nullable=False, default=False)
     is_blocked = db.Column(db.Boolean, nullable=False, default=False)
     profile_features_enabled = db.Column(db.Boolean, nullable=False, default=False)
     allow_file_uploads = db.Column(db.Boolean, nullable=False, default=False)
     marketplace_enabled = db.Column(db.Boolean, nullable=False, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
     muted_until = db.Column(db.DateTime, nullable=True)
     banned_until = db.Column(db.DateTime, nullable=True)
     warning_count = db.Column(db.Integer, nullable=False, default=0)
 
+    sent_messages = db.relationship(
+        'Message', foreign_keys='Message.user_id', back_populates='sender'
+    )
+    received_messages = db.relationship(
+        'Message', foreign_keys='Message.recipient_id', back_populates='recipient'
+    )
+    owned_groups = db.relationship('Group', back_populates='owner')
+    group_memberships = db.relationship('GroupMembership', back_populates='user')
+    moderator_assignment = db.relationship(
+        'ModeratorAssignment', back_populates='user', uselist=False, lazy='joined'
+    )
+    profile = db.relationship('UserProfile', back_populates='user', uselist=False, lazy='joined')
+    pending_uploads = db.relationship('MediaUploadToken', back_populates='user')
+    translated_transcripts = db.relationship('TranslatedTranscript', back_populates='speaker')
+    disciplinary_actions = db.relationship(
+        'DisciplinaryAction', foreign_keys='DisciplinaryAction.user_id', back_populates='user'
+    )
+    marketplace_listings = db.relationship('MarketplaceListing', back_populates='seller')
+    purchase_requests = db.relationship('MarketplaceRequest', back_populates='requester')
+    initiated_calls = db.relationship(
+        'CallSession', foreign_keys='CallSession.caller_id', back_populates='caller'
+    )
+    received_calls = db.relationship(
+        'CallSession', foreign_keys='CallSession.callee_id', back_populates='callee'
+    )
+    ended_calls = db.relationship(
+        'CallSession', foreign_keys='CallSession.ended_by_id', back_populates='ended_by'
+    )
+
     @property
     def has_pin(self) -> bool:
         """Return whether the user configured a security PIN."""
 
         return bool(self.pin_hash)
 
+    def set_password(self, password: str) -> None:
+        self.password = _password_hasher.hash(password)
+
+    def verify_password(self, password: str) -> bool:
+        """Check a login password, upgrading an outdated hash on success."""
+
+        if not password or len(password) > MAX_PASSWORD_LENGTH:
+            return False
+        matches, needs_rehash = _verify_hash(self.password, password)
+        if matches and needs_rehash:
+            self.set_password(password)
+        return matches
+
+    def set_pin(self, pin: str) -> None:
+        self.pin_hash = _password_hasher.hash(pin)
+
+    def verify_pin(self, pin: str) -> bool:
+        """Check the security PIN, upgrading an outdated hash on success."""
+
+        if not self.pin_hash or len(pin) != PIN_LENGTH:
+            return False
+        matches, needs_rehash = _verify_hash(self.pin_hash, pin)
+        if matches and needs_rehash:
+            self.set_pin(pin)
+        return matches
+
     @property
     def is_moderator(self) -> bool:
         return bool(getattr(self, "moderator_assignment", None))
 
+    @hybrid_property
+    def level(self) -> int:
+        """Return the level reached with the user's XP."""
+
+        return level_for_xp(self.xp or 0)[0]
+
+    @level.inplace.expression
+    @classmethod
+    def _level_expression(cls):
+        return case(
+            *((cls.xp >= threshold, lvl) for lvl, _, threshold in reversed(LEVELS[1:])),
+            else_=LEVELS[0][0],
+        )
+
+    @property
+    def badge(self) -> str:
+        """Return the badge name earned at the user's level."""
+
+        return _BADGES_BY_LEVEL.get(self.level, LEVELS[0][1])
+
+    @cached_property
+    def room(self) -> str:
+        """Socket.IO room that reaches every connection of the user."""
+
+        return f"user_{self.id}"
+
 
 # Message database model
 class Message(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
+    __table_args__ = (
+        db.Index('ix_message_conversation', 'user_id', 'recipient_id', 'timestamp'),
+    )
+
+    id = db.Column(_BIG_ID, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    recipient_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     text = db.Column(db.String(500), nullable=False, default="")
     ciphertext = db.Column(db.Text, nullable=True)
-    nonce = db.Column(db.String(48), nullable=True)
+    nonce = db.Column(db.String(24), nullable=True)
     is_encrypted = db.Column(db.Boolean, nullable=False, default=False)
-    timestamp = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    timestamp = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
 
-    sender = db.relationship('User', foreign_keys=[user_id], backref='sent_messages')
-    recipient = db.relationship('User', foreign_keys=[recipient_id], backref='received_messages')
+    sender = db.relationship('User', foreign_keys=[user_id], back_populates='sent_messages')
+    recipient = db.relationship(
+        'User', foreign_keys=[recipient_id], back_populates='received_messages'
+    )
     attachments = db.relationship(
-        'MessageAttachment', cascade='all, delete-orphan', backref='message'
+        'MessageAttachment', cascade='all, delete-orphan', back_populates='message', lazy='selectin'
     )
 
+    @classmethod
+    def between(cls, user_a: int, user_b: int):
+        """Return the criterion selecting the direct messages between two users."""
+
+        low, high = sorted((user_a, user_b))
+        return db.and_(_message_pair_low == low, _message_pair_high == high)
+
+
+# Direction-independent participant pair, so one index range holds a whole conversation
+_message_pair_low = case(
+    (Message.user_id < Message.recipient_id, Message.user_id), else_=Message.recipient_id
+)
+_message_pair_high = case(
+    (Message.user_id < Message.recipient_id, Message.recipient_id), else_=Message.user_id
+)
+db.Index('ix_message_pair', _message_pair_low, _message_pair_high, Message.timestamp.desc())
+
 
 class Group(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -74,37 +234,52 @@ class Group(db.Model):
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     hidden = db.Column(db.Boolean, default=True, nullable=False)
     expire_at = db.Column(db.DateTime, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
 
-    owner = db.relationship('User', backref='owned_groups')
-    memberships = db.relationship('GroupMembership', cascade='all, delete-orphan', backref='group')
-    messages = db.relationship('GroupMessage', cascade='all, delete-orphan', backref='group')
+    owner = db.relationship('User', back_populates='owned_groups')
+    memberships = db.relationship(
+        'GroupMembership', cascade='all, delete-orphan', back_populates='group', lazy='selectin'
+    )
+    # the full history; left lazy so loading a group never pulls every message
+    messages = db.relationship('GroupMessage', cascade='all, delete-orphan', back_populates='group')
 
 
 class GroupMembership(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     alias = db.Column(db.String(30), nullable=False)
-    joined_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    joined_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
 
-    user = db.relationship('User', backref='group_memberships')
+    group = db.relationship('Group', back_populates='memberships')
+    user = db.relationship('User', back_populates='group_memberships')
+    messages = db.relationship('GroupMessage', back_populates='membership')
 
 
 class GroupMessage(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
+    __table_args__ = (
+        db.Index('ix_group_message_group_timestamp', 'group_id', 'timestamp'),
+    )
+
+    id = db.Column(_BIG_ID, primary_key=True)
     group_id = db.Column(db.Integer, db.ForeignKey('group.id'), nullable=False)
-    membership_id = db.Column(db.Integer, db.ForeignKey('group_membership.id'), nullable=False)
+    membership_id = db.Column(
+        db.Integer, db.ForeignKey('group_membership.id'), nullable=False, index=True
+    )
     alias = db.Column(db.String(30), nullable=False)
     text = db.Column(db.String(500), nullable=False, default="")
     ciphertext = db.Column(db.Text, nullable=True)
-    nonce = db.Column(db.String(48), nullable=True)
+    nonce = db.Column(db.String(24), nullable=True)
     is_encrypted = db.Column(db.Boolean, nullable=False, default=False)
-    timestamp = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    timestamp = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
 
-    membership = db.relationship('GroupMembership', backref='messages')
+    group = db.relationship('Group', back_populates='messages')
+    membership = db.relationship('GroupMembership', back_populates='messages')
     attachments = db.relationship(
-        'GroupMessageAttachment', cascade='all, delete-orphan', backref='group_message'
+        'GroupMessageAttachment',
+        cascade='all, delete-orphan',
+        back_populates='group_message',
+        lazy='selectin',
     )
 
 
@@ -112,20 +287,20 @@ class BannedIP(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     ip_address = db.Column(db.String(100), unique=True, nullable=False)
     reason = db.Column(db.String(200), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
 
 
 class BannedCountry(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     country_code = db.Column(db.String(5), unique=True, nullable=False)
     reason = db.Column(db.String(200), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
 
 
 class BlockedWord(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     word = db.Column(db.String(100), unique=True, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
 
 
 class CommunicationHub(db.Model):
@@ -133,57 +308,62 @@ class CommunicationHub(db.Model):
     name = db.Column(db.String(100), unique=True, nullable=False)
     description = db.Column(db.String(255), nullable=True)
     is_enabled = db.Column(db.Boolean, default=True, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
 
 
 class ModeratorAssignment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), unique=True, nullable=False)
-    assigned_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    assigned_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
 
-    user = db.relationship('User', backref=db.backref('moderator_assignment', uselist=False))
+    user = db.relationship('User', back_populates='moderator_assignment')
 
 
 class MessageAttachment(db.Model):
     """Attachment associated with a direct message."""
 
-    id = db.Column(db.Integer, primary_key=True)
-    message_id = db.Column(db.Integer, db.ForeignKey('message.id'), nullable=False)
-    media_type = db.Column(db.String(30), nullable=False)
+    id = db.Column(_BIG_ID, primary_key=True)
+    message_id = db.Column(_BIG_ID, db.ForeignKey('message.id'), nullable=False, index=True)
+    media_type = db.Column(_MEDIA_TYPE, nullable=False)
     storage_path = db.Column(db.String(500), nullable=False)
     duration_seconds = db.Column(db.Float, nullable=True)
     mime_type = db.Column(db.String(100), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
+
+    message = db.relationship('Message', back_populates='attachments')
 
 
 class GroupMessageAttachment(db.Model):
     """Attachment associated with a group message."""
 
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(_BIG_ID, primary_key=True)
     group_message_id = db.Column(
-        db.Integer, db.ForeignKey('group_message.id'), nullable=False
+        _BIG_ID, db.ForeignKey('group_message.id'), nullable=False, index=True
     )
-    media_type = db.Column(db.String(30), nullable=False)
+    media_type = db.Column(_MEDIA_TYPE, nullable=False)
     storage_path = db.Column(db.String(500), nullable=False)
     duration_seconds = db.Column(db.Float, nullable=True)
     mime_type = db.Column(db.String(100), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
+
+    group_message = db.relationship('GroupMessage', back_populates='attachments')
 
 
 class MediaUploadToken(db.Model):
     """Temporary upload record awaiting attachment assignment."""
 
-    id = db.Column(db.Integer, primary_key=True)
-    token = db.Column(db.String(64), unique=True, nullable=False, default=lambda: uuid.uuid4().hex)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    id = db.Column(_BIG_ID, primary_key=True)
+    token = db.Column(db.Uuid, unique=True, nullable=False, default=uuid.uuid4)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     storage_path = db.Column(db.String(500), nullable=False)
-    media_type = db.Column(db.String(30), nullable=False)
+    media_type = db.Column(_MEDIA_TYPE, nullable=False)
     mime_type = db.Column(db.String(100), nullable=True)
     duration_seconds = db.Column(db.Float, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True, default=_upload_token_expiry)
     consumed_at = db.Column(db.DateTime, nullable=True)
 
-    user = db.relationship('User', backref='pending_uploads')
+    user = db.relationship('User', back_populates='pending_uploads')
 
     @property
     def is_consumed(self) -> bool:
@@ -191,7 +371,11 @@ class MediaUploadToken(db.Model):
 
     @property
     def is_expired(self) -> bool:
-        expiration = self.created_at + timedelta(hours=1)
+        expiration = self.expires_at
+        if expiration is None:  # not flushed yet
+            return False
+        if expiration.tzinfo is None:
+            expiration = expiration.replace(tzinfo=timezone.utc)
         return datetime.now(timezone.utc) > expiration
 
     def mark_consumed(self) -> None:
@@ -201,14 +385,16 @@ class MediaUploadToken(db.Model):
 class TranslatedTranscript(db.Model):
     """Persisted translated captions for call replays."""
 
-    id = db.Column(db.Integer, primary_key=True)
+    id = db.Column(_BIG_ID, primary_key=True)
     call_id = db.Column(db.String(64), nullable=False, index=True)
     speaker_user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=True)
     original_language = db.Column(db.String(10), nullable=True)
     target_language = db.Column(db.String(10), nullable=False)
     transcript_text = db.Column(db.Text, nullable=False)
     translated_text = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
+
+    speaker = db.relationship("User", back_populates="translated_transcripts")
 
 
 class UserProfile(db.Model):
@@ -222,25 +408,31 @@ class UserProfile(db.Model):
     social_links = db.Column(db.Text, nullable=True)
     theme_color = db.Column(db.String(20), nullable=True)
     avatar_path = db.Column(db.String(300), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
-    updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
+    updated_at = db.Column(
+        db.DateTime, default=_utcnow, server_default=func.now(), onupdate=_utcnow, nullable=False
+    )
 
-    user = db.relationship("User", backref=db.backref("profile", uselist=False))
+    user = db.relationship("User", back_populates="profile")
 
 
 class DisciplinaryAction(db.Model):
     """Administrative warnings, mutes, and bans with durations."""
 
-    id = db.Column(db.Integer, primary_key=True)
+    __table_args__ = (
+        db.Index('ix_disciplinary_action_user_expires', 'user_id', 'expires_at'),
+    )
+
+    id = db.Column(_BIG_ID, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     issued_by = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
-    action_type = db.Column(db.String(20), nullable=False)
+    action_type = db.Column(db.Enum(*DISCIPLINARY_ACTIONS, name="disciplinary_action"), nullable=False)
     reason = db.Column(db.String(255), nullable=True)
     duration_hours = db.Column(db.Integer, nullable=True)
     expires_at = db.Column(db.DateTime, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
 
-    user = db.relationship("User", foreign_keys=[user_id], backref="disciplinary_actions")
+    user = db.relationship("User", foreign_keys=[user_id], back_populates="disciplinary_actions")
     moderator = db.relationship("User", foreign_keys=[issued_by])
 
 
@@ -248,33 +440,40 @@ class MarketplaceListing(db.Model):
     """Product listing within the escrow marketplace."""
 
     id = db.Column(db.Integer, primary_key=True)
-    seller_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    seller_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
     title = db.Column(db.String(120), nullable=False)
     description = db.Column(db.Text, nullable=False)
     price_cents = db.Column(db.Integer, nullable=False)
     currency = db.Column(db.String(10), nullable=False, default="USD")
     expires_at = db.Column(db.DateTime, nullable=True)
     view_count = db.Column(db.Integer, nullable=False, default=0)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
-    updated_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
-    is_active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
+    updated_at = db.Column(
+        db.DateTime, default=_utcnow, server_default=func.now(), onupdate=_utcnow, nullable=False
+    )
+    is_active = db.Column(db.Boolean, nullable=False, default=True, index=True)
 
-    seller = db.relationship("User", backref="marketplace_listings")
+    seller = db.relationship("User", back_populates="marketplace_listings")
+    escrows = db.relationship("EscrowTransaction", back_populates="listing", lazy="selectin")
 
 
 class EscrowTransaction(db.Model):
     """Escrow workflow for marketplace purchases."""
 
     id = db.Column(db.Integer, primary_key=True)
-    listing_id = db.Column(db.Integer, db.ForeignKey("marketplace_listing.id"), nullable=False)
-    buyer_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    listing_id = db.Column(
+        db.Integer, db.ForeignKey("marketplace_listing.id"), nullable=False, index=True
+    )
+    buyer_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False, index=True)
     amount_cents = db.Column(db.Integer, nullable=False)
-    status = db.Column(db.String(30), nullable=False, default="held")
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    status = db.Column(
+        db.Enum(*ESCROW_STATUSES, name="escrow_status"), nullable=False, default="held", index=True
+    )
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
     released_at = db.Column(db.DateTime, nullable=True)
     payment_method = db.Column(db.String(30), nullable=True)
 
-    listing = db.relationship("MarketplaceListing", backref="escrows")
+    listing = db.relationship("MarketplaceListing", back_populates="escrows")
     buyer = db.relationship("User", foreign_keys=[buyer_id])
 
 
@@ -286,20 +485,23 @@ class MarketplaceRequest(db.Model):
     title = db.Column(db.String(120), nullable=False)
     description = db.Column(db.Text, nullable=False)
     budget_cents = db.Column(db.Integer, nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.now(timezone.utc), nullable=False)
+    created_at = db.Column(db.DateTime, default=_utcnow, server_default=func.now(), nullable=False)
     expires_at = db.Column(db.DateTime, nullable=True)
 
-    requester = db.relationship("User", backref="purchase_requests")
-
-    speaker = db.relationship("User", backref="translated_transcripts")
+    requester = db.relationship("User", back_populates="purchase_requests")
 
 
 class CallSession(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
+    __table_args__ = (
+        db.Index('ix_call_session_caller_status', 'caller_id', 'status'),
+        db.Index('ix_call_session_callee_status', 'callee_id', 'status'),
+    )
+
+    id = db.Column(_BIG_ID, primary_key=True)
     room_id = db.Column(db.String(64), nullable=False, unique=True)
     caller_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     callee_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
-    status = db.Column(db.String(20), nullable=False, default='initiated')
+    status = db.Column(db.Enum(*CALL_STATUSES, name='call_status'), nullable=False, default='initiated')
     started_at = db.Column(db.DateTime, nullable=True)
     accepted_at = db.Column(db.DateTime, nullable=True)
     ended_at = db.Column(db.DateTime, nullable=True)
@@ -307,6 +509,14 @@ class CallSession(db.Model):
     terminated_by_moderator = db.Column(db.Boolean, nullable=False, default=False)
     notes = db.Column(db.Text, nullable=True)
 
-    caller = db.relationship('User', foreign_keys=[caller_id], backref='initiated_calls')
-    callee = db.relationship('User', foreign_keys=[callee_id], backref='received_calls')
-    ended_by = db.relationship('User', foreign_keys=[ended_by_id], backref='ended_calls')
+    caller = db.relationship('User', foreign_keys=[caller_id], back_populates='initiated_calls')
+    callee = db.relationship('User', foreign_keys=[callee_id], back_populates='received_calls')
+    ended_by = db.relationship('User', foreign_keys=[ended_by_id], back_populates='ended_calls')
+
+    @cached_property
+    def caller_room(self) -> str:
+        return f"user_{self.caller_id}"
+
+    @cached_property
+    def callee_room(self) -> str:
+        return f"user_{self.callee_id}"
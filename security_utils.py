@@ -2,19 +2,44 @@
 
 from __future__ import annotations
 
-import base64
+import binascii
 import hashlib
 import hmac
-import secrets
-from typing import Iterable, Tuple
-
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
+import itertools
+import os
+import threading
+import weakref
+from functools import lru_cache
+from typing import Dict, Iterable, Tuple
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from flask import current_app
 
 
 _DIRECT_PREFIX = "direct"
 _GROUP_PREFIX = "group"
+_DIRECT_MARKER = _DIRECT_PREFIX + ":"
+_GROUP_MARKER = _GROUP_PREFIX + ":"
+
+_KEY_CACHE_MAX_ENTRIES = 4096
+_KEY_CACHE: Dict[Tuple[bytes, str], bytes] = {}
+_KEY_CACHE_LOCK = threading.Lock()
+_AESGCM_CACHE: Dict[bytes, AESGCM] = {}
+_EXPORT_CACHE: Dict[Tuple[bytes, str], str] = {}
+# HMAC keyed with the current secret; copying it skips re-hashing the
+# padded key blocks for every identifier.
+_KEYED_HMAC: Tuple[bytes, hmac.HMAC] | None = None
+# Encoded conversation secret per Flask app, resolved on first use
+_SECRET_CACHE: "weakref.WeakKeyDictionary[object, bytes]" = weakref.WeakKeyDictionary()
+
+# GCM nonces only have to be unique per key, never reused. Each process
+# draws a random 64-bit prefix (again after a fork, and whenever the
+# 32-bit counter is exhausted) and counts up from there, so a collision
+# needs two processes to draw the same 64-bit prefix.
+_NONCE_COUNTER_LIMIT = 1 << 32
+_NONCE_LOCK = threading.Lock()
+_nonce_prefix = os.urandom(8)
+_nonce_counter = itertools.count()
 
 
 class ConversationIdentifierError(ValueError):
@@ -22,19 +47,27 @@ class ConversationIdentifierError(ValueError):
 
 
 def _get_secret_bytes() -> bytes:
-    secret = current_app.config.get("CONVERSATION_KEY_SECRET") or current_app.config.get("SECRET_KEY")
+    app = current_app._get_current_object()
+    cached = _SECRET_CACHE.get(app)
+    if cached is not None:
+        return cached
+
+    secret = app.config.get("CONVERSATION_KEY_SECRET") or app.config.get("SECRET_KEY")
     if not secret:
         raise RuntimeError("Conversation key secret is not configured.")
-    if isinstance(secret, bytes):
-        return secret
-    return str(secret).encode("utf-8")
+    if not isinstance(secret, bytes):
+        secret = str(secret).encode("utf-8")
+    _SECRET_CACHE[app] = secret
+    return secret
 
 
 def conversation_identifier_for_direct(user_a: int, user_b: int) -> str:
     """Return a normalized identifier for a direct conversation."""
 
-    participants = sorted([int(user_a), int(user_b)])
-    return f"{_DIRECT_PREFIX}:{participants[0]}:{participants[1]}"
+    first, second = int(user_a), int(user_b)
+    if first > second:
+        first, second = second, first
+    return f"{_DIRECT_PREFIX}:{first}:{second}"
 
 
 def conversation_identifier_for_group(group_id: int) -> str:
@@ -43,62 +76,155 @@ def conversation_identifier_for_group(group_id: int) -> str:
     return f"{_GROUP_PREFIX}:{int(group_id)}"
 
 
+@lru_cache(maxsize=8192)
 def parse_conversation_identifier(identifier: str) -> Tuple[str, Tuple[int, ...]]:
-    """Parse a conversation identifier into its type and participants."""
+    """Parse a conversation identifier into its type and participants.
+
+    Results are memoized; invalid identifiers raise on every call since
+    ``lru_cache`` never stores exceptions.
+    """
 
     if not identifier:
         raise ConversationIdentifierError("Conversation identifier is required.")
-    parts = identifier.split(":")
-    prefix = parts[0]
-    if prefix == _DIRECT_PREFIX and len(parts) == 3:
-        try:
-            first = int(parts[1])
-            second = int(parts[2])
-        except (TypeError, ValueError) as exc:
-            raise ConversationIdentifierError("Direct conversation participant identifiers must be integers.") from exc
-        return _DIRECT_PREFIX, tuple(sorted((first, second)))
-    if prefix == _GROUP_PREFIX and len(parts) == 2:
-        try:
-            group_id = int(parts[1])
-        except (TypeError, ValueError) as exc:
-            raise ConversationIdentifierError("Group conversation identifier must include a numeric id.") from exc
-        return _GROUP_PREFIX, (group_id,)
+    if identifier.startswith(_DIRECT_MARKER):
+        first, separator, second = identifier[len(_DIRECT_MARKER):].partition(":")
+        if separator and ":" not in second:
+            try:
+                first_id = int(first)
+                second_id = int(second)
+            except (TypeError, ValueError) as exc:
+                raise ConversationIdentifierError("Direct conversation participant identifiers must be integers.") from exc
+            if first_id > second_id:
+                first_id, second_id = second_id, first_id
+            return _DIRECT_PREFIX, (first_id, second_id)
+    elif identifier.startswith(_GROUP_MARKER):
+        group = identifier[len(_GROUP_MARKER):]
+        if ":" not in group:
+            try:
+                group_id = int(group)
+            except (TypeError, ValueError) as exc:
+                raise ConversationIdentifierError("Group conversation identifier must include a numeric id.") from exc
+            return _GROUP_PREFIX, (group_id,)
     raise ConversationIdentifierError("Conversation identifier format is invalid.")
 
 
+def _keyed_hmac(secret: bytes) -> hmac.HMAC:
+    """Return a fresh HMAC-SHA256 for the secret, copied from a precomputed one."""
+
+    global _KEYED_HMAC
+    keyed = _KEYED_HMAC
+    if keyed is None or keyed[0] != secret:
+        keyed = (secret, hmac.new(secret, digestmod=hashlib.sha256))
+        _KEYED_HMAC = keyed
+    return keyed[1].copy()
+
+
 def derive_conversation_key_material(identifier: str) -> bytes:
-    """Derive deterministic key material for a conversation identifier."""
+    """Derive deterministic key material for a conversation identifier.
+
+    Keys are cached per ``(secret, identifier)``. The secret itself is read
+    once per app, so call :func:`clear_conversation_key_cache` after rotating it.
+    """
 
     secret = _get_secret_bytes()
-    message = identifier.encode("utf-8")
-    return hmac.new(secret, message, hashlib.sha256).digest()
+    cache_key = (secret, identifier)
+    key = _KEY_CACHE.get(cache_key)
+    if key is not None:
+        return key
+
+    mac = _keyed_hmac(secret)
+    mac.update(identifier.encode("utf-8"))
+    key = mac.digest()
+    with _KEY_CACHE_LOCK:
+        if len(_KEY_CACHE) >= _KEY_CACHE_MAX_ENTRIES:
+            _KEY_CACHE.pop(next(iter(_KEY_CACHE)), None)
+        _KEY_CACHE[cache_key] = key
+    return key
+
+
+def _get_aesgcm(identifier: str) -> AESGCM:
+    """Return the AES-GCM cipher for a conversation, keyed once per conversation key."""
+
+    key = derive_conversation_key_material(identifier)
+    aead = _AESGCM_CACHE.get(key)
+    if aead is not None:
+        return aead
+
+    aead = AESGCM(key)
+    with _KEY_CACHE_LOCK:
+        if len(_AESGCM_CACHE) >= _KEY_CACHE_MAX_ENTRIES:
+            _AESGCM_CACHE.pop(next(iter(_AESGCM_CACHE)), None)
+        _AESGCM_CACHE[key] = aead
+    return aead
+
+
+def _reset_nonce_source() -> None:
+    global _nonce_prefix, _nonce_counter
+    _nonce_prefix = os.urandom(8)
+    _nonce_counter = itertools.count()
+
+
+os.register_at_fork(after_in_child=_reset_nonce_source)
+
+
+def _next_nonce() -> bytes:
+    """Return a fresh 96-bit nonce: the process prefix plus a 32-bit counter."""
+
+    with _NONCE_LOCK:
+        value = next(_nonce_counter)
+        if value >= _NONCE_COUNTER_LIMIT:
+            _reset_nonce_source()
+            value = next(_nonce_counter)
+        prefix = _nonce_prefix
+    return prefix + value.to_bytes(4, "big")
+
+
+def clear_conversation_key_cache() -> None:
+    """Forget every cached conversation key and cipher, e.g. after rotating the secret."""
+
+    global _KEYED_HMAC
+    with _KEY_CACHE_LOCK:
+        _KEY_CACHE.clear()
+        _AESGCM_CACHE.clear()
+        _EXPORT_CACHE.clear()
+        _KEYED_HMAC = None
+        _SECRET_CACHE.clear()
 
 
 def export_conversation_key(identifier: str) -> str:
     """Return a base64 encoded conversation key."""
 
+    cache_key = (_get_secret_bytes(), identifier)
+    exported = _EXPORT_CACHE.get(cache_key)
+    if exported is not None:
+        return exported
+
     key_bytes = derive_conversation_key_material(identifier)
-    return base64.b64encode(key_bytes).decode("utf-8")
+    exported = binascii.b2a_base64(key_bytes, newline=False).decode("ascii")
+    with _KEY_CACHE_LOCK:
+        if len(_EXPORT_CACHE) >= _KEY_CACHE_MAX_ENTRIES:
+            _EXPORT_CACHE.pop(next(iter(_EXPORT_CACHE)), None)
+        _EXPORT_CACHE[cache_key] = exported
+    return exported
 
 
 def encrypt_conversation_message(identifier: str, plaintext: str) -> Tuple[str | None, str | None]:
     """Encrypt plaintext for a conversation, returning nonce and ciphertext."""
 
-    if plaintext is None:
+    if not plaintext:
         return None, None
-    text = plaintext.strip()
-    if not text:
+    # callers pass already-stripped text, so stripping the encoded bytes is
+    # enough and avoids a second copy of the string
+    data = plaintext.encode("utf-8").strip()
+    if not data:
         return None, None
 
-    key = derive_conversation_key_material(identifier)
-    nonce = secrets.token_bytes(12)
-    cipher = Cipher(algorithms.AES(key), modes.GCM(nonce), backend=default_backend())
-    encryptor = cipher.encryptor()
-    ciphertext = encryptor.update(text.encode("utf-8")) + encryptor.finalize()
-    payload = ciphertext + encryptor.tag
+    nonce = _next_nonce()
+    # AESGCM returns the ciphertext with the 16-byte tag appended
+    payload = _get_aesgcm(identifier).encrypt(nonce, data, None)
     return (
-        base64.b64encode(nonce).decode("utf-8"),
-        base64.b64encode(payload).decode("utf-8"),
+        binascii.b2a_base64(nonce, newline=False).decode("ascii"),
+        binascii.b2a_base64(payload, newline=False).decode("ascii"),
     )
 
 
@@ -108,15 +234,11 @@ def decrypt_conversation_message(identifier: str, nonce_b64: str, payload_b64: s
     if not nonce_b64 or not payload_b64:
         raise ValueError("Nonce and payload are required for decryption.")
 
-    key = derive_conversation_key_material(identifier)
-    nonce = base64.b64decode(nonce_b64)
-    payload = base64.b64decode(payload_b64)
+    nonce = binascii.a2b_base64(nonce_b64)
+    payload = binascii.a2b_base64(payload_b64)
     if len(payload) < 16:
         raise ValueError("Ciphertext payload is too short.")
-    ciphertext, tag = payload[:-16], payload[-16:]
-    cipher = Cipher(algorithms.AES(key), modes.GCM(nonce, tag), backend=default_backend())
-    decryptor = cipher.decryptor()
-    plaintext = decryptor.update(ciphertext) + decryptor.finalize()
+    plaintext = _get_aesgcm(identifier).decrypt(nonce, payload, None)
     return plaintext.decode("utf-8")
 
 
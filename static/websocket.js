@@ -551,6 +551,7 @@ class CallClient {
         this.socket.on("call_incoming", (payload) => this.handleIncoming(payload));
         this.socket.on("call_answered", (payload) => this.handleAnswered(payload));
         this.socket.on("ice_candidate", (payload) => this.handleIceCandidate(payload));
+        this.socket.on("ice_candidates", (payload) => this.handleIceCandidates(payload));
         this.socket.on("call_ended", (payload) => this.handleEnded(payload));
         this.socket.on("call_declined", (payload) => this.handleDeclined(payload));
         this.socket.on("call_error", (payload) => this.handleCallError(payload));
@@ -766,6 +767,15 @@ class CallClient {
         }
     }
 
+    async handleIceCandidates(payload) {
+        if (!payload || !Array.isArray(payload.candidates)) {
+            return;
+        }
+        for (const candidate of payload.candidates) {
+            await this.handleIceCandidate({ sessionId: payload.sessionId, candidate });
+        }
+    }
+
     hangup() {
         if (!this.sessionId) {
             return;
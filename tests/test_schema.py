@@ -0,0 +1,86 @@
+"""Schema upgrade checks for ``ensure_schema``.
+
+``app`` runs ``ensure_schema()`` on import, so every check boots the app in
+a fresh interpreter pointed at its own SQLite file.
+"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# The user table as the first release created it, before level and badge
+# were derived from XP.
+BASELINE_USER_TABLE = """
+CREATE TABLE user (
+    id INTEGER NOT NULL,
+    username VARCHAR(20) NOT NULL,
+    password VARCHAR(200) NOT NULL,
+    xp INTEGER NOT NULL,
+    level INTEGER NOT NULL,
+    badge VARCHAR(50) NOT NULL,
+    last_arrival_at DATETIME NOT NULL,
+    pin_hash VARCHAR(200),
+    is_admin BOOLEAN NOT NULL,
+    is_blocked BOOLEAN NOT NULL,
+    profile_features_enabled BOOLEAN NOT NULL,
+    allow_file_uploads BOOLEAN NOT NULL,
+    marketplace_enabled BOOLEAN NOT NULL,
+    created_at DATETIME NOT NULL,
+    muted_until DATETIME,
+    banned_until DATETIME,
+    warning_count INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (username)
+)
+"""
+
+
+def run_app(db_path, code=""):
+    """Import ``app`` against ``db_path`` in a subprocess, then run ``code``."""
+
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(REPO_ROOT), env.get("PYTHONPATH")]))
+    return subprocess.run(
+        [sys.executable, "-c", f"import app\n{code}"],
+        cwd=db_path.parent,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+
+def test_ensure_schema_is_repeatable(tmp_path):
+    db_path = tmp_path / "chatterbox.db"
+
+    first = run_app(db_path)
+    assert first.returncode == 0, first.stderr
+
+    second = run_app(db_path, "app.ensure_schema()\napp.ensure_schema()")
+    assert second.returncode == 0, second.stderr
+
+
+def test_ensure_schema_upgrades_baseline_user_table(tmp_path):
+    db_path = tmp_path / "chatterbox.db"
+    with sqlite3.connect(db_path) as connection:
+        connection.execute(BASELINE_USER_TABLE)
+
+    result = run_app(
+        db_path,
+        "from models import User, db\n"
+        "with app.app.app_context():\n"
+        "    user = User(username='newcomer')\n"
+        "    user.set_password('secret-password')\n"
+        "    db.session.add(user)\n"
+        "    db.session.commit()\n",
+    )
+    assert result.returncode == 0, result.stderr
+
+    with sqlite3.connect(db_path) as connection:
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(user)")}
+    assert "level" not in columns
+    assert "badge" not in columns
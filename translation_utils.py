@@ -14,6 +14,10 @@ else:
     IMPORT_ERROR = None
 
 
+# Longer texts are rarely repeated verbatim and would crowd out short phrases
+_MAX_CACHED_TEXT_LENGTH = 500
+
+
 class TranslationError(RuntimeError):
     """Raised when translation is unavailable or fails."""
 
@@ -25,15 +29,28 @@ def _get_translator() -> Translator:
     return Translator()
 
 
-def translate_text(text: str, target_language: str, source_language: Optional[str] = None) -> str:
-    """Translate text to a target language using googletrans."""
-
-    if not text:
-        return ""
-
+def _translate(text: str, target_language: str, source_language: str) -> str:
     translator = _get_translator()
     try:
-        result = translator.translate(text, dest=target_language, src=source_language or "auto")
+        result = translator.translate(text, dest=target_language, src=source_language)
     except Exception as exc:  # pragma: no cover - network related
         raise TranslationError("Unable to complete translation request.") from exc
     return result.text
+
+
+_cached_translate = lru_cache(maxsize=4096)(_translate)
+
+
+def translate_text(text: str, target_language: str, source_language: Optional[str] = None) -> str:
+    """Translate text to a target language using googletrans.
+
+    Short texts are memoized per language pair; failures are never cached.
+    """
+
+    if not text:
+        return ""
+
+    source_language = source_language or "auto"
+    if len(text) > _MAX_CACHED_TEXT_LENGTH:
+        return _translate(text, target_language, source_language)
+    return _cached_translate(text, target_language, source_language)